@@ -2,7 +2,9 @@
 
 import sys
 import os
-import glob
+import select
+import struct
+import time
 import platform
 import argparse
 import serial  # pyserial
@@ -64,48 +66,60 @@ KEYMAP = {
 }
 
 
+# 0xAA + big-endian 16-bit length, packed in one C call
+_FRAME_HDR = struct.Struct('>BH')
+_LEN_UNPACK = struct.Struct('>H').unpack_from
+_CMD_SC = bytes([CMD_PS2_SCANCODE])
+_CMD_MOUSE = bytes([CMD_PS2_MOUSE])
+
+
 def frame(payload: bytes) -> bytes:
     length = len(payload)
     if length > 0x07FF:
         raise ValueError('frame too long')
-    return bytes([0xAA, (length >> 8) & 0xFF, length & 0xFF]) + payload
+    return _FRAME_HDR.pack(0xAA, length) + payload
 
 
 def build_scancode_frame(scancodes: bytes) -> bytes:
-    payload = bytes([CMD_PS2_SCANCODE]) + scancodes
-    return frame(payload)
+    # join header/cmd/body directly instead of materializing the payload first
+    length = len(scancodes) + 1
+    if length > 0x07FF:
+        raise ValueError('frame too long')
+    return b''.join((_FRAME_HDR.pack(0xAA, length), _CMD_SC, scancodes))
 
 def build_mouse_frame(mouse_bytes: bytes) -> bytes:
-    payload = bytes([CMD_PS2_MOUSE]) + mouse_bytes
-    return frame(payload)
+    length = len(mouse_bytes) + 1
+    if length > 0x07FF:
+        raise ValueError('frame too long')
+    return b''.join((_FRAME_HDR.pack(0xAA, length), _CMD_MOUSE, mouse_bytes))
 
 # ---------------------- PS/2 mouse helpers ----------------------
 
+# Byte 0 of a PS/2 mouse packet depends only on buttons and the sign/overflow
+# bits -- 128 combinations, precomputed once.
+# Index: buttons&7 | sign_dx<<3 | sign_dy<<4 | x_ovf<<5 | y_ovf<<6
+B0_TABLE = bytes(
+    0x08 | (i & 7)
+    | (0x10 if i & 0x08 else 0)
+    | (0x20 if i & 0x10 else 0)
+    | (0x40 if i & 0x20 else 0)
+    | (0x80 if i & 0x40 else 0)
+    for i in range(128)
+)
+
+
 def ps2_mouse_packet(dx: int, dy: int, buttons: int) -> bytes:
     """
     Build a 3-byte PS/2 mouse packet.
     buttons: bit0=L, bit1=R, bit2=M
     dx, dy: relative movement; positive dy from pygame means down, PS/2 expects inverted Y.
     """
-    def clamp8(v):
-        return max(-128, min(127, v))
-    x_ovf = 0
-    y_ovf = 0
-    if dx < -128 or dx > 127:
-        x_ovf = 1
-    if dy < -128 or dy > 127:
-        y_ovf = 1
-    dx = clamp8(dx)
-    dy = clamp8(-dy)  # invert Y for PS/2 packet
-    b0 = 0x08
-    if buttons & 0x1: b0 |= 0x01  # L
-    if buttons & 0x2: b0 |= 0x02  # R
-    if buttons & 0x4: b0 |= 0x04  # M
-    if dx < 0: b0 |= 0x10
-    if dy < 0: b0 |= 0x20
-    if x_ovf: b0 |= 0x40
-    if y_ovf: b0 |= 0x80
-    return bytes([b0, dx & 0xFF, dy & 0xFF])
+    x_ovf = dx < -128 or dx > 127
+    y_ovf = dy < -128 or dy > 127
+    dx = max(-128, min(127, dx))
+    dy = max(-128, min(127, -dy))  # invert Y for PS/2 packet
+    idx = (buttons & 7) | ((dx < 0) << 3) | ((dy < 0) << 4) | (x_ovf << 5) | (y_ovf << 6)
+    return bytes((B0_TABLE[idx], dx & 0xFF, dy & 0xFF))
 
 
 def _get_make_break(keyname):
@@ -134,21 +148,30 @@ def _derive_break_from_make(make_bytes):
     return out
 
 
+# Final make/break byte strings, resolved once at import so key events are
+# just dict lookups instead of per-call list building.
+KEYMAP_MAKE = {}
+KEYMAP_BREAK = {}
+for _k in KEYMAP:
+    _make, _brk = _get_make_break(_k)
+    if _brk is None:
+        _brk = _derive_break_from_make(_make)
+    KEYMAP_MAKE[_k] = bytes(_make)
+    KEYMAP_BREAK[_k] = bytes(_brk)
+del _k, _make, _brk
+
+# Complete UART frames for single-key presses/releases, the only shape the
+# interactive loop ever sends. One dict lookup replaces expand+frame per event.
+KEY_FRAME_DOWN = {k: build_scancode_frame(v) for k, v in KEYMAP_MAKE.items()}
+KEY_FRAME_UP = {k: build_scancode_frame(v) for k, v in KEYMAP_BREAK.items()}
+
+
 def expand_keys_to_scancodes(names, pressed=True):
-    out = []
-    for name in names:
-        key = name.lower()
-        if key not in KEYMAP:
-            raise KeyError(f'Unknown key: {name}')
-        make, brk = _get_make_break(key)
-        if pressed:
-            out.extend(make)
-        else:
-            if brk is not None:
-                out.extend(brk)
-            else:
-                out.extend(_derive_break_from_make(make))
-    return bytes(out)
+    table = KEYMAP_MAKE if pressed else KEYMAP_BREAK
+    try:
+        return b''.join(table[name.lower()] for name in names)
+    except KeyError as e:
+        raise KeyError(f'Unknown key: {e.args[0]}') from None
 
 
 def parse_hex_bytes(args):
@@ -158,9 +181,61 @@ def parse_hex_bytes(args):
     return bytes(out)
 
 
+def set_low_latency(ser):
+    """Best-effort reduction of USB-serial buffering latency.
+
+    FTDI adapters hold small packets for 16 ms by default, which dominates
+    the round-trip of the tiny frames this tool exchanges (mouse ACKs in
+    particular). Silently skips ports/platforms without these knobs.
+    """
+    try:
+        fd = ser.fileno()
+    except Exception:
+        return
+    if sys.platform.startswith('linux'):
+        # FTDI sysfs knob: 16 ms -> 1 ms
+        try:
+            name = os.path.basename(ser.port or '')
+            with open(f'/sys/bus/usb-serial/devices/{name}/latency_timer', 'w') as f:
+                f.write('1')
+        except OSError:
+            pass
+        # ASYNC_LOW_LATENCY in struct serial_struct.flags
+        try:
+            import array
+            import fcntl
+            TIOCGSERIAL, TIOCSSERIAL = 0x541E, 0x541F
+            ASYNC_LOW_LATENCY = 1 << 13
+            buf = array.array('i', [0] * 64)
+            fcntl.ioctl(fd, TIOCGSERIAL, buf)
+            buf[4] |= ASYNC_LOW_LATENCY
+            fcntl.ioctl(fd, TIOCSSERIAL, buf)
+        except (ImportError, OSError):
+            pass
+    elif sys.platform == 'darwin':
+        # IOSSDATALAT: receive data latency in microseconds
+        try:
+            import fcntl
+            import struct
+            IOSSDATALAT = 0x80085400  # _IOW('T', 0, unsigned long)
+            fcntl.ioctl(fd, IOSSDATALAT, struct.pack('L', 1))
+        except (ImportError, OSError):
+            pass
+
+
 def send(port, baud, payload: bytes):
-    with serial.Serial(port, baudrate=baud, timeout=1) as ser:
-        ser.write(payload)
+    # One open / one write / one flush: multi-key payloads are already a
+    # single frame by the time they get here, so the whole send is one
+    # syscall on the wire
+    # write_timeout=None: let a bulk frame drain at line rate instead of
+    # pyserial chopping the write into timeout-bounded chunks
+    with serial.Serial(port, baudrate=baud, timeout=1, write_timeout=None) as ser:
+        set_low_latency(ser)
+        try:
+            ser.set_buffer_size(rx_size=65536, tx_size=65536)  # Windows only
+        except AttributeError:
+            pass
+        ser.write(memoryview(payload))
         ser.flush()
 
 
@@ -168,8 +243,71 @@ def send(port, baud, payload: bytes):
 
 def run_interactive(port, baud):
     import pygame
+    import queue
+    import threading
 
     ser = serial.Serial(port, baudrate=baud, timeout=0)
+    set_low_latency(ser)
+    # On POSIX, drain the port with select + one big os.read per poll instead
+    # of pyserial's chunked reads. Windows select() only handles sockets.
+    rx_fd = ser.fileno() if os.name == 'posix' else None
+    if rx_fd is None:
+        # let the RX thread block briefly in read() instead of spin-polling
+        ser.timeout = 0.01
+    # Same fd for raw TX: os.write skips pyserial's wrapper layers and
+    # emits immediately, no flush() needed
+    tx_fd = rx_fd
+
+    # Serial I/O runs on its own threads so a stalled USB write (or a burst
+    # of debug text) never blocks the pygame event pump. The main loop talks
+    # to them through a TX queue and a lock-protected RX byte buffer.
+    tx_q = queue.SimpleQueue()
+    rx_lock = threading.Lock()
+    rx_shared = bytearray()
+
+    def tx_worker():
+        while True:
+            data = tx_q.get()
+            if data is None:
+                break
+            try:
+                if tx_fd is not None:
+                    # the port fd is non-blocking, so wait out a full kernel
+                    # buffer instead of dropping bytes
+                    view = memoryview(data)
+                    while view:
+                        try:
+                            n = os.write(tx_fd, view)
+                        except BlockingIOError:
+                            select.select([], [tx_fd], [])
+                            continue
+                        view = view[n:]
+                else:
+                    ser.write(data)
+            except Exception:
+                break
+
+    def rx_worker():
+        while True:
+            try:
+                if rx_fd is not None:
+                    if not select.select([rx_fd], [], [], 0.1)[0]:
+                        continue
+                    data = os.read(rx_fd, 65536)
+                else:
+                    # one read drains everything the OS has buffered
+                    data = ser.read(max(1, ser.in_waiting))
+                    if not data:
+                        continue
+            except Exception:
+                break
+            if data:
+                with rx_lock:
+                    rx_shared.extend(data)
+
+    threading.Thread(target=tx_worker, daemon=True).start()
+    threading.Thread(target=rx_worker, daemon=True).start()
+
     pygame.init()
     try:
         win = pygame.display.set_mode((480, 160))
@@ -179,14 +317,23 @@ def run_interactive(port, baud):
         win = pygame.display.set_mode((1, 1))
     pygame.display.set_caption('ao486 I/O (click to capture mouse; GUI+ESC to release)')
     font = pygame.font.Font(None, 24)
-    clock = pygame.time.Clock()
 
-    def send_sc(sc_bytes: bytes):
-        ser.write(build_scancode_frame(sc_bytes))
+    # font.render re-rasterizes every glyph through FreeType; status lines
+    # repeat constantly, so cache the rendered surfaces
+    from functools import lru_cache
+
+    @lru_cache(maxsize=256)
+    def render_cached(text, color):
+        return font.render(text, True, color)
+
+    # Coalesce all frames generated during one loop iteration into a single
+    # ser.write() -- many tiny writes stall on USB-serial adapters.
+    tx_buf = bytearray()
+
     def send_mouse(mouse_bytes: bytes):
         if not mouse_bytes:
             return
-        ser.write(build_mouse_frame(mouse_bytes))
+        tx_buf.extend(build_mouse_frame(mouse_bytes))
 
     # --------- PS/2 mouse device emulation (host<->device) ---------
     # Respond to controller->mouse bytes arriving as response type 0x06 frames.
@@ -195,74 +342,67 @@ def run_interactive(port, baud):
     expect_value_for = None # 'F3' or 'E8'
     streaming_enabled = False
 
-    def mouse_reply_byte(b: int):
-        # Wrap a single device->host byte as a type 0x0E command back to FPGA
-        ser.write(build_mouse_frame(bytes([b & 0xFF])))
-
     def on_host_to_mouse_byte(b: int):
-        nonlocal ps2_id, rate_seq, expect_value_for, streaming_enabled
+        nonlocal ps2_id, expect_value_for, streaming_enabled
+        # One command can elicit several device->host bytes (ACK + data);
+        # collect them and send the whole reply as a single 0x0E frame.
+        reply = bytearray()
         # Handle second byte of prior F3/E8 first
         if expect_value_for == 'F3':
             # Host sends sample rate value; acknowledge
-            mouse_reply_byte(0xFA)
+            reply.append(0xFA)
             # Track magic sequence 200, 100, 80
             rate_seq.append(b & 0xFF)
             if len(rate_seq) > 3:
-                rate_seq = rate_seq[-3:]
+                del rate_seq[:-3]
             if rate_seq == [200, 100, 80]:
                 ps2_id = 0x03
             expect_value_for = None
-            return
-        if expect_value_for == 'E8':
+        elif expect_value_for == 'E8':
             # Host sends resolution value; acknowledge
-            mouse_reply_byte(0xFA)
+            reply.append(0xFA)
             expect_value_for = None
-            return
-
-        # Interpret as a command byte
-        cmd = b & 0xFF
-        if cmd == 0xFF:            # Reset
-            mouse_reply_byte(0xFA) # ACK
-            mouse_reply_byte(0xAA) # BAT OK
-            mouse_reply_byte(0x00) # device ID after reset per many implementations
-            streaming_enabled = False
-            rate_seq.clear()
-            ps2_id = 0x00
-        elif cmd == 0xF2:          # Get ID
-            mouse_reply_byte(0xFA)
-            mouse_reply_byte(ps2_id)
-        elif cmd == 0xF3:          # Set sample rate (expects 1 data byte)
-            mouse_reply_byte(0xFA)
-            expect_value_for = 'F3'
-        elif cmd == 0xE8:          # Set resolution (expects 1 data byte)
-            mouse_reply_byte(0xFA)
-            expect_value_for = 'E8'
-        elif cmd in (0xE6, 0xE7, 0xF0, 0xF5, 0xF6, 0xEA):
-            # Common commands we just ACK
-            #  E6/E7 scaling, F0 set remote/wrap (ignored), F5 disable, F6 defaults, EA set stream (not strictly used here)
-            mouse_reply_byte(0xFA)
-            if cmd == 0xF5:
+        else:
+            # Interpret as a command byte
+            cmd = b & 0xFF
+            if cmd == 0xFF:            # Reset
+                # ACK, BAT OK, device ID after reset per many implementations
+                reply.extend(b'\xFA\xAA\x00')
                 streaming_enabled = False
-            elif cmd in (0xEA, 0xF4):
+                rate_seq.clear()
+                ps2_id = 0x00
+            elif cmd == 0xF2:          # Get ID
+                reply.extend((0xFA, ps2_id))
+            elif cmd == 0xF3:          # Set sample rate (expects 1 data byte)
+                reply.append(0xFA)
+                expect_value_for = 'F3'
+            elif cmd == 0xE8:          # Set resolution (expects 1 data byte)
+                reply.append(0xFA)
+                expect_value_for = 'E8'
+            elif cmd in (0xE6, 0xE7, 0xF0, 0xF5, 0xF6, 0xEA):
+                # Common commands we just ACK
+                #  E6/E7 scaling, F0 set remote/wrap (ignored), F5 disable, F6 defaults, EA set stream (not strictly used here)
+                reply.append(0xFA)
+                if cmd == 0xF5:
+                    streaming_enabled = False
+                elif cmd in (0xEA, 0xF4):
+                    streaming_enabled = True
+            elif cmd == 0xF4:          # Enable streaming
+                reply.append(0xFA)
                 streaming_enabled = True
-        elif cmd == 0xF4:          # Enable streaming
-            mouse_reply_byte(0xFA)
-            streaming_enabled = True
-        elif cmd == 0xE9:          # Status
-            mouse_reply_byte(0xFA)
-            # 3 status bytes: we can send zeros for simplicity
-            mouse_reply_byte(0x00)
-            mouse_reply_byte(0x00)
-            mouse_reply_byte(0x00)
-        else:
-            # Unknown -> RESEND (FE) is a conservative choice
-            mouse_reply_byte(0xFE)
+            elif cmd == 0xE9:          # Status
+                # ACK + 3 status bytes: we can send zeros for simplicity
+                reply.extend(b'\xFA\x00\x00\x00')
+            else:
+                # Unknown -> RESEND (FE) is a conservative choice
+                reply.append(0xFE)
+        tx_buf.extend(build_mouse_frame(bytes(reply)))
 
     # UART frame reader: handle type 0x06 (host->mouse) and 0x07 (debug)
+    # Parsed with a read cursor instead of del rx_buf[:n] so consuming a
+    # frame is O(1); the buffer is compacted once the consumed prefix grows.
     rx_buf = bytearray()
-    rx_state = 'SEEK'
-    rx_len = 0
-    rx_payload = bytearray()
+    rx_pos = 0
 
     last_text = ''
     mouse_text = ''
@@ -281,117 +421,198 @@ def run_interactive(port, baud):
         except Exception:
             pass
     running = True
+    # Accumulated relative motion; high-rate mice can deliver hundreds of
+    # MOUSEMOTION events per frame, but PS/2 only carries deltas so one
+    # packet per loop iteration is enough.
+    acc_dx = 0
+    acc_dy = 0
+
+    # Per-event-type handlers dispatched through one dict lookup, instead of
+    # re-resolving pygame module attributes in an elif chain for every event.
+    KEYDOWN = pygame.KEYDOWN
+    K_ESCAPE = pygame.K_ESCAPE
+    KMOD_GUI = pygame.KMOD_GUI
+
+    def handle_quit(ev):
+        nonlocal running
+        running = False
+
+    def handle_mbd(ev):
+        nonlocal buttons, mouse_text
+        if not captured:
+            set_capture(True)
+            mouse_text = 'Mouse captured'
+            return
+        b = ev.button
+        if b == 1: buttons |= 0x1
+        elif b == 3: buttons |= 0x2
+        elif b == 2: buttons |= 0x4
+        pkt = ps2_mouse_packet(0, 0, buttons)
+        send_mouse(pkt)
+        mouse_text = f'Btn down {b}: {pkt.hex()}'
+
+    def handle_mbu(ev):
+        nonlocal buttons, mouse_text
+        if not captured:
+            return
+        b = ev.button
+        if b == 1: buttons &= ~0x1
+        elif b == 3: buttons &= ~0x2
+        elif b == 2: buttons &= ~0x4
+        pkt = ps2_mouse_packet(0, 0, buttons)
+        send_mouse(pkt)
+        mouse_text = f'Btn up {b}: {pkt.hex()}'
+
+    def handle_motion(ev):
+        nonlocal acc_dx, acc_dy
+        if captured:
+            acc_dx += ev.rel[0]
+            acc_dy += ev.rel[1]
+
+    def handle_key(ev):
+        nonlocal mouse_text, last_text
+        name = pygame_key_to_name(ev.key)
+        # Release capture on GUI+ESC (Cmd-ESC/Win-ESC)
+        if ev.type == KEYDOWN and ev.key == K_ESCAPE and (ev.mod & KMOD_GUI):
+            set_capture(False)
+            mouse_text = 'Mouse released (GUI+ESC)'
+            return
+        if name is None:
+            return
+        pressed = (ev.type == KEYDOWN)
+        tx_buf.extend((KEY_FRAME_DOWN if pressed else KEY_FRAME_UP)[name])
+        sc = (KEYMAP_MAKE if pressed else KEYMAP_BREAK)[name]
+        last_text = f"{name} {'down' if pressed else 'up'}: {sc.hex()}"
+
+    handlers = {
+        pygame.QUIT: handle_quit,
+        pygame.MOUSEBUTTONDOWN: handle_mbd,
+        pygame.MOUSEBUTTONUP: handle_mbu,
+        pygame.MOUSEMOTION: handle_motion,
+        pygame.KEYDOWN: handle_key,
+        pygame.KEYUP: handle_key,
+    }
+
+    # Let SDL drop event types we don't handle (window, text input,
+    # joystick noise, ...) before they ever become Python objects
+    WANT = list(handlers)
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(WANT)
+
+    # Redraw bookkeeping: repaint only when the status lines changed,
+    # capped at ~15 Hz -- event processing runs much more often than that
+    drawn_state = None
+    last_draw = 0.0
+    prev_r1 = None
+    prev_r2 = None
+
     while running:
-        for ev in pygame.event.get():
-            if ev.type == pygame.QUIT:
-                running = False
-            elif ev.type == pygame.MOUSEBUTTONDOWN:
-                if not captured:
-                    set_capture(True)
-                    mouse_text = 'Mouse captured'
-                else:
-                    b = ev.button
-                    if b == 1: buttons |= 0x1
-                    elif b == 3: buttons |= 0x2
-                    elif b == 2: buttons |= 0x4
-                    pkt = ps2_mouse_packet(0, 0, buttons)
-                    send_mouse(pkt)
-                    mouse_text = f'Btn down {b}: {pkt.hex()}'
-            elif ev.type == pygame.MOUSEBUTTONUP and captured:
-                b = ev.button
-                if b == 1: buttons &= ~0x1
-                elif b == 3: buttons &= ~0x2
-                elif b == 2: buttons &= ~0x4
-                pkt = ps2_mouse_packet(0, 0, buttons)
-                send_mouse(pkt)
-                mouse_text = f'Btn up {b}: {pkt.hex()}'
-            elif ev.type == pygame.MOUSEMOTION and captured:
-                dx, dy = ev.rel
-                pkt = ps2_mouse_packet(dx, dy, buttons)
-                send_mouse(pkt)
-                mouse_text = f'Move {dx},{dy}: {pkt.hex()}'
-            elif ev.type in (pygame.KEYDOWN, pygame.KEYUP):
-                name = pygame_key_to_name(ev.key)
-                # Release capture on GUI+ESC (Cmd-ESC/Win-ESC)
-                if ev.type == pygame.KEYDOWN and ev.key == getattr(pygame, 'K_ESCAPE') and (ev.mod & getattr(pygame, 'KMOD_GUI')):
-                    set_capture(False)
-                    mouse_text = 'Mouse released (GUI+ESC)'
-                    continue
-                if name is None:
-                    continue
-                pressed = (ev.type == pygame.KEYDOWN)
-                sc = expand_keys_to_scancodes([name], pressed=pressed)
-                send_sc(sc)
-                last_text = f"{name} {'down' if pressed else 'up'}: {sc.hex()}"
-
-        # Poll UART for incoming frames
+        # Sleep until an event arrives (or 8 ms passes so the UART still
+        # gets polled) rather than busy-ticking at 120 Hz
+        first = pygame.event.wait(8)
+        events = pygame.event.get(WANT)
+        if first.type != pygame.NOEVENT:
+            events.insert(0, first)
+        for ev in events:
+            h = handlers.get(ev.type)
+            if h:
+                h(ev)
+
+        # Emit coalesced mouse motion, splitting to respect the int8 range
+        if (acc_dx or acc_dy) and captured:
+            mouse_text = f'Move {acc_dx},{acc_dy}'
+            while acc_dx or acc_dy:
+                dx = max(-128, min(127, acc_dx))
+                dy = max(-128, min(127, acc_dy))
+                send_mouse(ps2_mouse_packet(dx, dy, buttons))
+                acc_dx -= dx
+                acc_dy -= dy
+        acc_dx = 0
+        acc_dy = 0
+
+        # Take whatever the RX thread has collected and parse it
+        with rx_lock:
+            if rx_shared:
+                rx_buf.extend(rx_shared)
+                rx_shared.clear()
+        # parse frames; each complete frame is processed inline, so no
+        # state needs to carry over beyond the cursor
         while True:
-            data = ser.read(256)
-            if not data:
+            # Look for 0xAA from the cursor on
+            idx = rx_buf.find(0xAA, rx_pos)
+            if idx < 0:
+                rx_buf.clear()
+                rx_pos = 0
                 break
-            # print(f"rx: {data.hex()}")
-            rx_buf.extend(data)
-            # parse frames
-            while True:
-                if rx_state == 'SEEK':
-                    # Look for 0xAA
-                    idx = rx_buf.find(b'\xAA')
-                    if idx < 0:
-                        rx_buf.clear()
-                        break
-                    if idx > 0:
-                        del rx_buf[:idx]
-                    if len(rx_buf) < 4:
-                        break
-                    rx_len = (rx_buf[1] << 8) | rx_buf[2]
-                    # payload should have rx_len bytes
-                    if len(rx_buf) < 3 + rx_len:
-                        break
-                    rx_payload = bytearray(rx_buf[3:3+rx_len])
-                    del rx_buf[:3+rx_len]
-                    rx_state = 'HAVE'
-                if rx_state == 'HAVE':
-                    if not rx_payload:
-                        rx_state = 'SEEK'
-                        continue
-                    rtype = rx_payload[0]
-                    body = rx_payload[1:]
-                    if rtype == 0x06:
-                        # host->mouse byte stream; may be multiple bytes if we aggregate later
-                        print(f"host->mouse: {body.hex()}")
-                        for bb in body:
-                            on_host_to_mouse_byte(bb)
-                    elif rtype == 0x07:
-                        # debug text: print as ASCII
-                        try:
-                            sys.stdout.write(body.decode('latin1'))
-                            sys.stdout.flush()
-                        except Exception:
-                            pass
-                    # Done
-                    rx_state = 'SEEK'
-
-        # Simple status draw
-        win.fill((0, 0, 0))
-        txt1 = font.render(last_text, True, (200, 200, 200))
-        win.blit(txt1, (10, 10))
-        txt2 = font.render(("[Captured] " if captured else "[Click to capture] ") + mouse_text, True, (150, 180, 220))
-        win.blit(txt2, (10, 40))
-        pygame.display.flip()
-        clock.tick(120)
+            rx_pos = idx
+            if len(rx_buf) - rx_pos < 4:
+                break
+            rx_len = _LEN_UNPACK(rx_buf, rx_pos + 1)[0]
+            # payload should have rx_len bytes
+            if len(rx_buf) - rx_pos < 3 + rx_len:
+                break
+            rx_payload = memoryview(rx_buf)[rx_pos + 3:rx_pos + 3 + rx_len]
+            rx_pos += 3 + rx_len
+            if rx_payload:
+                rtype = rx_payload[0]
+                if rtype == 0x06:
+                    # host->mouse byte stream; may be multiple bytes if we aggregate later
+                    print(f"host->mouse: {rx_payload[1:].hex()}")
+                    for bb in rx_payload[1:]:
+                        on_host_to_mouse_byte(bb)
+                elif rtype == 0x07:
+                    # debug text: print as ASCII
+                    try:
+                        sys.stdout.write(bytes(rx_payload[1:]).decode('latin1'))
+                        sys.stdout.flush()
+                    except Exception:
+                        pass
+            rx_payload.release()  # allow rx_buf compaction below
+        # Drop the consumed prefix once it gets large to cap memory
+        if rx_pos > 4096:
+            del rx_buf[:rx_pos]
+            rx_pos = 0
+
+        # Flush everything queued this iteration in one write
+        if tx_buf:
+            tx_q.put_nowait(bytes(tx_buf))
+            tx_buf.clear()
+
+        # Simple status draw, throttled
+        state = (last_text, mouse_text, captured)
+        now = time.monotonic()
+        if state != drawn_state and now - last_draw >= 1 / 15:
+            txt1 = render_cached(last_text, (200, 200, 200))
+            txt2 = render_cached(("[Captured] " if captured else "[Click to capture] ") + mouse_text, (150, 180, 220))
+            r1 = txt1.get_rect(topleft=(10, 10))
+            r2 = txt2.get_rect(topleft=(10, 40))
+            # erase the previous line too, in case the new text is shorter
+            er1 = r1.union(prev_r1) if prev_r1 else r1
+            er2 = r2.union(prev_r2) if prev_r2 else r2
+            win.fill((0, 0, 0), er1)
+            win.fill((0, 0, 0), er2)
+            win.blit(txt1, r1)
+            win.blit(txt2, r2)
+            # push just the two text rows instead of flipping the window
+            pygame.display.update((er1, er2))
+            prev_r1, prev_r2 = r1, r2
+            drawn_state = state
+            last_draw = now
 
+    tx_q.put(None)  # stop the TX thread
     ser.close()
 
 
+# Lazily built pygame keycode -> KEYMAP name table (pygame may not be
+# importable in CLI-only use, so it cannot be filled at module import).
+_KEY_NAME_CACHE = None
+
+
 def pygame_key_to_name(k):
+    global _KEY_NAME_CACHE
+    if _KEY_NAME_CACHE is not None:
+        return _KEY_NAME_CACHE.get(k)
     import pygame
-    # Letters
-    if pygame.K_a <= k <= pygame.K_z:
-        return chr(k - pygame.K_a + ord('a'))
-    # Digits
-    if pygame.K_0 <= k <= pygame.K_9:
-        return chr(k)
-    # Common controls
     mapping = {
         pygame.K_RETURN: 'enter',
         pygame.K_ESCAPE: 'esc',
@@ -449,20 +670,37 @@ def pygame_key_to_name(k):
         pygame.K_KP4: 'kp_4', pygame.K_KP5: 'kp_5', pygame.K_KP6: 'kp_6', pygame.K_KP7: 'kp_7',
         pygame.K_KP8: 'kp_8', pygame.K_KP9: 'kp_9',
     }
+    # Letters and digits expanded as plain integer keys
+    for code in range(pygame.K_a, pygame.K_z + 1):
+        mapping[code] = chr(code - pygame.K_a + ord('a'))
+    for code in range(pygame.K_0, pygame.K_9 + 1):
+        mapping[code] = chr(code)
+    _KEY_NAME_CACHE = mapping
     return mapping.get(k)
 
 
 
 
+from pathlib import Path
 from typing import Optional
 
 
+_port_cache = (0.0, None)  # (when we last looked, what we found)
+
+
 def auto_detect_port() -> Optional[str]:
-    """On macOS, choose the alphabetically last /dev/tty.usbserial* device."""
+    """On macOS, choose the most recently appeared /dev/tty.usbserial* device.
+    The result is cached for 2 seconds since the GUI can ask repeatedly."""
+    global _port_cache
     if platform.system() != 'Darwin':
         return None
-    cands = sorted(glob.glob('/dev/tty.usbserial*'))
-    return cands[-1] if cands else None
+    now = time.monotonic()
+    if now - _port_cache[0] < 2.0:
+        return _port_cache[1]
+    cands = list(Path('/dev').glob('tty.usbserial*'))
+    port = str(max(cands, key=lambda p: p.stat().st_mtime)) if cands else None
+    _port_cache = (now, port)
+    return port
 
 
 def run_gui():
@@ -482,6 +720,12 @@ def run_gui():
     root = tk.Tk()
     root.title("486Tang Toolbox")
     root.geometry("900x650")
+
+    def ui_call(fn, *args, **kwargs):
+        # Tk is not thread-safe; root.after is the one safe way for worker
+        # threads to touch widgets (and it avoids re-pumping the whole event
+        # queue the way root.update() does).
+        root.after(0, lambda: fn(*args, **kwargs))
     
     # Create notebook for tabs
     notebook = ttk.Notebook(root)
@@ -662,33 +906,22 @@ def run_gui():
         # Create empty VHD in background thread
         def create_thread():
             try:
-                progress_var.set(f"Creating empty {size_mb}MB VHD file...")
-                root.update()
-                
-                # Create file filled with zeros
-                size_bytes = size_mb * 1024 * 1024
-                chunk_size = 1024 * 1024  # Write 1MB at a time
-                
+                ui_call(progress_var.set, f"Creating empty {size_mb}MB VHD file...")
+
+                # Create a sparse zero file: truncating to the target size is
+                # O(1) and sparse-aware filesystems (ext4/APFS/NTFS) read the
+                # hole back as zeros without ever allocating it.
                 with open(file, 'wb') as f:
-                    remaining = size_bytes
-                    while remaining > 0:
-                        write_size = min(chunk_size, remaining)
-                        f.write(b'\x00' * write_size)
-                        remaining -= write_size
-                        
-                        # Update progress
-                        percent = ((size_bytes - remaining) * 100) // size_bytes
-                        progress_var.set(f"Creating empty {size_mb}MB VHD file... {percent}%")
-                        root.update()
-                
+                    f.truncate(size_mb * 1024 * 1024)
+
                 # Set the created file as the HDD selection
-                hdd_var.set(file)
-                progress_var.set(f"Empty {size_mb}MB VHD created successfully!")
-                messagebox.showinfo("Success", f"Empty VHD created: {file}")
-                
+                ui_call(hdd_var.set, file)
+                ui_call(progress_var.set, f"Empty {size_mb}MB VHD created successfully!")
+                ui_call(messagebox.showinfo, "Success", f"Empty VHD created: {file}")
+
             except Exception as e:
-                progress_var.set(f"Error creating VHD: {e}")
-                messagebox.showerror("Error", f"Failed to create VHD: {e}")
+                ui_call(progress_var.set, f"Error creating VHD: {e}")
+                ui_call(messagebox.showerror, "Error", f"Failed to create VHD: {e}")
         
         threading.Thread(target=create_thread, daemon=True).start()
     
@@ -741,18 +974,17 @@ def run_gui():
         # Run creation in thread to avoid blocking GUI
         def create_thread():
             try:
-                progress_var.set("Creating SD card image...")
-                root.update()
+                ui_call(progress_var.set, "Creating SD card image...")
                 success = create_sdcard_image(bios, vga, hdd, output, mem_mb)
                 if success:
-                    progress_var.set("SD card image created successfully!")
-                    messagebox.showinfo("Success", f"SD card image created: {output}")
+                    ui_call(progress_var.set, "SD card image created successfully!")
+                    ui_call(messagebox.showinfo, "Success", f"SD card image created: {output}")
                 else:
-                    progress_var.set("Failed to create SD card image")
-                    messagebox.showerror("Error", "Failed to create SD card image")
+                    ui_call(progress_var.set, "Failed to create SD card image")
+                    ui_call(messagebox.showerror, "Error", "Failed to create SD card image")
             except Exception as e:
-                progress_var.set(f"Error: {e}")
-                messagebox.showerror("Error", f"Error creating SD card image: {e}")
+                ui_call(progress_var.set, f"Error: {e}")
+                ui_call(messagebox.showerror, "Error", f"Error creating SD card image: {e}")
         
         threading.Thread(target=create_thread, daemon=True).start()
     
@@ -776,6 +1008,35 @@ def run_gui():
     root.mainloop()
 
 
+def _do_hex(tail, port, baud, parser):
+    send(port, baud, build_scancode_frame(parse_hex_bytes(tail)))
+
+
+def _do_keys(tail, port, baud, parser):
+    send(port, baud, build_scancode_frame(expand_keys_to_scancodes(tail, pressed=True)))
+
+
+def _do_key(tail, port, baud, parser):
+    if len(tail) != 2:
+        parser.error('key mode: need <name> <down|up>')
+    name, action = tail[0], tail[1].lower()
+    if action not in ('down', 'up'):
+        parser.error('action must be down|up')
+    send(port, baud, build_scancode_frame(expand_keys_to_scancodes([name], pressed=(action == 'down'))))
+
+
+def _do_interactive(tail, port, baud, parser):
+    run_interactive(port, baud)
+
+
+MODE_DISPATCH = {
+    'hex': _do_hex,
+    'keys': _do_keys,
+    'key': _do_key,
+    'interactive': _do_interactive,
+}
+
+
 def main():
     # New CLI with options, but keep backward compatibility with legacy positional form.
     parser = argparse.ArgumentParser(description='ao486 keyboard/mouse UART bridge')
@@ -794,18 +1055,16 @@ def main():
     baud = args.baud
     rest = args.rest
 
-    MODES = {'hex', 'keys', 'key', 'interactive'}
-
     # Interpret positional args in a backward-compatible way.
     mode = None
     tail = []
 
     if rest:
-        if rest[0] in MODES:
+        if rest[0] in MODE_DISPATCH:
             # New style: mode first
             mode = rest[0]
             tail = rest[1:]
-        elif len(rest) >= 3 and rest[2] in MODES:
+        elif len(rest) >= 3 and rest[2] in MODE_DISPATCH:
             # Legacy: <port> <baud> <mode> [...]
             port = port or rest[0]
             if baud is None:
@@ -830,27 +1089,7 @@ def main():
         baud = 115200
 
     # Execute mode
-    if mode == 'hex':
-        sc = parse_hex_bytes(tail)
-        data = build_scancode_frame(sc)
-        send(port, baud, data)
-    elif mode == 'keys':
-        sc = expand_keys_to_scancodes(tail, pressed=True)
-        data = build_scancode_frame(sc)
-        send(port, baud, data)
-    elif mode == 'key':
-        if len(tail) != 2:
-            parser.error('key mode: need <name> <down|up>')
-        name, action = tail[0], tail[1].lower()
-        if action not in ('down', 'up'):
-            parser.error('action must be down|up')
-        sc = expand_keys_to_scancodes([name], pressed=(action == 'down'))
-        data = build_scancode_frame(sc)
-        send(port, baud, data)
-    elif mode == 'interactive':
-        run_interactive(port, baud)
-    else:
-        parser.error('Unknown mode')
+    MODE_DISPATCH[mode](tail, port, baud, parser)
 
 
 if __name__ == '__main__':
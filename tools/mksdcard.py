@@ -12,7 +12,15 @@ Creates an SD card image by combining three input files:
 import sys
 import os
 import argparse
+import mmap
+import shutil
 import struct
+from array import array
+
+try:
+    import numpy as np  # optional; geometry search falls back to pure Python
+except ImportError:
+    np = None
 
 
 SECTOR_SIZE = 512
@@ -21,6 +29,9 @@ VGA_BIOS_OFFSET = 64 * 1024   # 64KB -> sectors 128..191
 CFG_SECTOR = 192              # sector 192 (right after VGA BIOS)
 CFG_OFFSET = CFG_SECTOR * SECTOR_SIZE
 HDD_OFFSET = 128 * 1024       # 128KB -> sector 256
+# Images with an HDD up to this size are assembled in RAM and written in one
+# call; anything larger is streamed so memory use stays flat
+SMALL_IMAGE_LIMIT = 256 * 1024 * 1024
 
 
 def decode_chs(head, sec_cyl, cyl_lo):
@@ -38,84 +49,120 @@ def chs_to_lba(cyl, head, sec, heads, spt):
     return ((cyl * heads) + head) * spt + (sec - 1)
 
 
+def _plausible_geometries_np(mbr_data: bytes, candidates):
+    """Vectorized plausibility search: checks every (heads, spt) candidate
+    against all four partition entries in one broadcast instead of a Python
+    double loop. Mirrors decode_chs/chs_to_lba."""
+    raw = mbr_data[0x1BE:0x1BE + 64]
+    e = np.frombuffer(raw, dtype=np.uint8).reshape(4, 16).astype(np.int64)
+    lba = np.frombuffer(raw, dtype='<u4').reshape(4, 4)[:, 2:].astype(np.int64)
+    lba_start, lba_sectors = lba[:, 0], lba[:, 1]
+    used = e[:, 4] != 0  # ptype
+
+    heads_arr = np.array([h for h, s in candidates], dtype=np.int64)
+    spt_arr = np.array([s for h, s in candidates], dtype=np.int64)
+
+    def chs_matches(head, sec_cyl, cyl_lo, target):
+        # (4, n_candidates) matrix of "CHS maps to target LBA"; entries that
+        # are unused or carry no valid CHS don't constrain any candidate
+        sec = sec_cyl & 0x3F
+        cyl = ((sec_cyl & 0xC0) << 2) | cyl_lo
+        valid = used & ~((head == 0xFF) & (sec_cyl == 0xFF) & (cyl_lo == 0xFF)) & (sec != 0)
+        lba_calc = (cyl[:, None] * heads_arr[None, :] + head[:, None]) * spt_arr[None, :] \
+            + (sec[:, None] - 1)
+        return np.where(valid[:, None], lba_calc == target[:, None], True)
+
+    ok = chs_matches(e[:, 1], e[:, 2], e[:, 3], lba_start)
+    ok &= chs_matches(e[:, 5], e[:, 6], e[:, 7], lba_start + lba_sectors - 1)
+    ok_all = ok.all(axis=0)
+    return [c for c, good in zip(candidates, ok_all) if good]
+
+
 def calc_geometry_from_mbr(mbr_data: bytes, total_bytes: int):
     """Replicates verilator/ide.cpp calc_geometry in Python.
     Returns (cylinders, heads, spt)."""
-    # Partition table entries start at 0x1BE
-    entries = [mbr_data[0x1BE + i * 16: 0x1BE + (i + 1) * 16] for i in range(4)]
+    # Preference order: spt=63 first, then larger head counts, so the first
+    # plausible candidate is the one we want
     candidates = [
-        (255, 63),
-        (240, 63), (224, 56),
-        (128, 63), (64, 63), (32, 63), (16, 63),
-        (15, 63), (15, 32),
-        (8, 32), (4, 32),
+        (255, 63), (240, 63), (128, 63), (64, 63), (32, 63), (16, 63), (15, 63),
+        (224, 56),
+        (15, 32), (8, 32), (4, 32),
     ]
 
-    plausible = []
-    for heads, spt in candidates:
-        ok = True
-        for e in entries:
-            (boot, begHead, begSecCyl, begCylLo, ptype, endHead, endSecCyl, endCylLo,
-             lbaStart, lbaSectors) = struct.unpack('<BBBBBBBBII', e)
-            if ptype == 0:
-                continue
-            valid_beg, cs, hs, ss = decode_chs(begHead, begSecCyl, begCylLo)
-            if valid_beg:
-                lba_calc = chs_to_lba(cs, hs, ss, heads, spt)
-                if lba_calc != lbaStart:
-                    ok = False
-            valid_end, ce, he, se = decode_chs(endHead, endSecCyl, endCylLo)
-            if valid_end:
-                lba_end = lbaStart + lbaSectors - 1
-                lba_calc = chs_to_lba(ce, he, se, heads, spt)
-                if lba_calc != lba_end:
-                    ok = False
-            if not ok:
-                break
-        if ok:
-            plausible.append((heads, spt))
+    # Fallback: typical translation
+    heads, spt = 255, 63
 
-    if not plausible:
-        # Fallback: typical translation
-        heads, spt = 255, 63
+    if np is not None:
+        plausible = _plausible_geometries_np(mbr_data, candidates)
+        if plausible:
+            heads, spt = plausible[0]
     else:
-        # Prefer spt=63, then larger head count
-        plausible.sort(key=lambda x: (x[1], x[0]), reverse=True)
-        heads, spt = plausible[0]
+        # Partition table entries start at 0x1BE
+        entries = [mbr_data[0x1BE + i * 16: 0x1BE + (i + 1) * 16] for i in range(4)]
+        for cand_heads, cand_spt in candidates:
+            ok = True
+            for e in entries:
+                (boot, begHead, begSecCyl, begCylLo, ptype, endHead, endSecCyl, endCylLo,
+                 lbaStart, lbaSectors) = struct.unpack('<BBBBBBBBII', e)
+                if ptype == 0:
+                    continue
+                valid_beg, cs, hs, ss = decode_chs(begHead, begSecCyl, begCylLo)
+                if valid_beg:
+                    lba_calc = chs_to_lba(cs, hs, ss, cand_heads, cand_spt)
+                    if lba_calc != lbaStart:
+                        ok = False
+                valid_end, ce, he, se = decode_chs(endHead, endSecCyl, endCylLo)
+                if valid_end:
+                    lba_end = lbaStart + lbaSectors - 1
+                    lba_calc = chs_to_lba(ce, he, se, cand_heads, cand_spt)
+                    if lba_calc != lba_end:
+                        ok = False
+                if not ok:
+                    break
+            if ok:
+                heads, spt = cand_heads, cand_spt
+                break
 
     cylinders = total_bytes // SECTOR_SIZE // heads // spt
     return cylinders, heads, spt
 
 
-def build_identify_words(cyl: int, heads: int, spt: int):
+# all 256 IDENTIFY words serialized little-endian in one C call
+_IDENT_PACK = struct.Struct('<256H')
+
+
+def _pack_ata_string(s: str):
+    """Pack an ATA string: two chars per word, high byte first."""
+    return tuple((ord(s[i]) << 8) | ord(s[i + 1]) for i in range(0, len(s), 2))
+
+
+# fixed ID strings, packed once: words 10..19 and 27..46
+_SERIAL_WORDS = _pack_ata_string('AOHD00000'.ljust(20))
+_MODEL_WORDS = _pack_ata_string('AO Harddrive'.ljust(40))
+
+
+def build_identify_bytes(cyl: int, heads: int, spt: int) -> bytes:
+    """Build the 512-byte little-endian ATA IDENTIFY sector."""
     total = cyl * heads * spt
+    total_lo = total & 0xFFFF
+    total_hi = (total >> 16) & 0xFFFF
+    cyl_cap = min(16383, cyl)
     ident = [0] * 256
     ident[0] = 0x0040
-    ident[1] = min(16383, cyl)
+    ident[1] = cyl_cap
     ident[3] = heads
     ident[4] = (512 * spt) & 0xFFFF
     ident[5] = 512
     ident[6] = spt
     # words 7..9 zero
     # words 10..19 serial "AOHD000      "
-    ident[10] = (ord('A') << 8) | ord('O')
-    ident[11] = (ord('H') << 8) | ord('D')
-    ident[12] = (ord('0') << 8) | ord('0')
-    ident[13] = (ord('0') << 8) | ord('0')
-    ident[14] = (ord('0') << 8) | ord(' ')
-    ident[15] = (ord(' ') << 8) | ord(' ')
-    ident[16] = (ord(' ') << 8) | ord(' ')
-    ident[17] = (ord(' ') << 8) | ord(' ')
-    ident[18] = (ord(' ') << 8) | ord(' ')
-    ident[19] = (ord(' ') << 8) | ord(' ')
+    ident[10:20] = _SERIAL_WORDS
     ident[20] = 3
     ident[21] = 512
     ident[22] = 4
     # 23..26 zero (firmware rev)
     # 27..46 model number "AO Harddrive            "
-    model = "AO Harddrive".ljust(40)  # 20 words
-    for i in range(20):
-        ident[27 + i] = (ord(model[2 * i]) << 8) | ord(model[2 * i + 1])
+    ident[27:47] = _MODEL_WORDS
     ident[47] = 16
     ident[48] = 1
     ident[49] = 1 << 9
@@ -123,14 +170,14 @@ def build_identify_words(cyl: int, heads: int, spt: int):
     ident[51] = 0x0200
     ident[52] = 0x0200
     ident[53] = 0x0007
-    ident[54] = min(16383, cyl)
+    ident[54] = cyl_cap
     ident[55] = heads
     ident[56] = spt
-    ident[57] = total & 0xFFFF
-    ident[58] = (total >> 16) & 0xFFFF
+    ident[57] = total_lo
+    ident[58] = total_hi
     ident[59] = 0
-    ident[60] = total & 0xFFFF
-    ident[61] = (total >> 16) & 0xFFFF
+    ident[60] = total_lo
+    ident[61] = total_hi
     ident[62] = 0
     ident[63] = 0
     ident[64] = 0
@@ -151,40 +198,41 @@ def build_identify_words(cyl: int, heads: int, spt: int):
     # 89..92 zero
     ident[93] = 1 | (1 << 14) | 0x2000
     # 94..99 zero
-    ident[100] = total & 0xFFFF
-    ident[101] = (total >> 16) & 0xFFFF
+    ident[100] = total_lo
+    ident[101] = total_hi
     # rest zero
-    return ident
+    return _IDENT_PACK.pack(*ident)
+
 
+# CMOS values from init_cmos() that never change between builds, with the
+# 0xF400+offset addresses folded in at import time.
+# EQUIP configuration: https://wiki.nox-rhea.org/back2root/ibm-pc-ms-dos/interrupts/int_11/start
+_EQUIP = 1 | (1 << 2) | (2 << 4)  # diskette + PS/2 mouse + 80x25 color
+_STATIC_CMOS_PAIRS = (
+    (0xF414, _EQUIP),  # equipment byte
+    (0xF410, 0x20),    # 1.2MB 5.25
+    (0xF40D, 0x80),    # battery backed up
+    (0xF409, 0x24),    # year in BCD
+    (0xF408, 0x01),    # month
+    (0xF407, 0x01),    # day
+    (0xF432, 0x20),    # century
+)
 
-def build_config_stream(mem_kb: int, hdd_path: str) -> bytes:
+
+def build_config_stream(mem_kb: int, mbr: bytes, hdd_total_bytes: int) -> bytes:
     """Build multi-sector config stream with {addr32, data32} pairs, terminated by addr=0.
-    Includes CMOS, geometry, and IDENTIFY block (512 bytes -> 128 pairs -> 2 sectors)."""
-    # CMOS values from init_cmos()
+    Includes CMOS, geometry, and IDENTIFY block (512 bytes -> 128 pairs -> 2 sectors).
+    The caller supplies the HDD's MBR sector and total size, so the image is
+    only opened once per build."""
     pairs = []
-    # Extended memory size in KB at CMOS 0x30/0x31
+    # Extended memory size in KB at CMOS 0x30/0x31 is the only per-build
+    # CMOS value; the rest come precomputed from _STATIC_CMOS_PAIRS
     pairs.append((0xF400 + 0x30, mem_kb & 0xFF))
     pairs.append((0xF400 + 0x31, (mem_kb >> 8) & 0xFF))
-    # EQUIP configuration: https://wiki.nox-rhea.org/back2root/ibm-pc-ms-dos/interrupts/int_11/start
-    equip = 1        # diskette exists
-    equip |= 1 << 2  # PS/2 mouse exists
-    equip |= 2 << 4  # initial mode 80x25 color
-    pairs.append((0xF400 + 0x14, equip))  # diskette exists
-    pairs.append((0xF400 + 0x10, 0x20))  # 1.2MB 5.25
-    # Date
-    pairs.append((0xF400 + 0x0D, 0x80))  # battery backed up
-    
-    pairs.append((0xF400 + 0x09, 0x24))  # year in BCD
-    pairs.append((0xF400 + 0x08, 0x01))  # month
-    pairs.append((0xF400 + 0x07, 0x01))  # day
-    pairs.append((0xF400 + 0x32, 0x20))  # century
+    pairs.extend(_STATIC_CMOS_PAIRS)
 
     # HDD geometry from MBR
-    with open(hdd_path, 'rb') as f:
-        mbr = f.read(SECTOR_SIZE)
-        f.seek(0, os.SEEK_END)
-        total_bytes = f.tell()
-    cyl, heads, spt = calc_geometry_from_mbr(mbr, total_bytes)
+    cyl, heads, spt = calc_geometry_from_mbr(mbr, hdd_total_bytes)
     # 0xF001..0xF005 per ide.cpp
     pairs.append((0xF001, cyl))
     pairs.append((0xF002, heads))
@@ -192,27 +240,61 @@ def build_config_stream(mem_kb: int, hdd_path: str) -> bytes:
     pairs.append((0xF004, spt * heads))
     pairs.append((0xF005, spt * heads * cyl))
 
-    # Append IDENTIFY contents as 128 writes to 0xF000
-    ident = build_identify_words(cyl, heads, spt)
-    for i in range(128):
-        lo = ident[2 * i] & 0xFFFF
-        hi = ident[2 * i + 1] & 0xFFFF
-        data = (hi << 16) | lo
-        pairs.append((0xF000, data))
-
-    # Serialize as little-endian {addr32, data32} pairs
-    data = bytearray()
-    for addr, val in pairs:
-        data += struct.pack('<I', addr & 0xFFFFFFFF)
-        data += struct.pack('<I', val & 0xFFFFFFFF)
-    # termination word
-    data += struct.pack('<I', 0)
+    # Append IDENTIFY contents as 128 writes to 0xF000; the sector is
+    # already little-endian, so on LE hosts the u32 values are just a
+    # zero-copy view of it
+    ident = build_identify_bytes(cyl, heads, spt)
+    if sys.byteorder == 'little':
+        ident_u32 = memoryview(ident).cast('I')
+    else:
+        ident_u32 = [v for (v,) in struct.iter_unpack('<I', ident)]
+    pairs.extend((0xF000, v) for v in ident_u32)
+
+    # Serialize as little-endian {addr32, data32} pairs plus the termination
+    # word; array('I').tobytes() is a straight memcpy of the u32 buffer on
+    # little-endian hosts
+    flat = array('I', (v & 0xFFFFFFFF for pair in pairs for v in pair))
+    flat.append(0)
+    if sys.byteorder != 'little':
+        flat.byteswap()
+    data = bytearray(flat.tobytes())
     # pad to sector boundary
-    if len(data) % SECTOR_SIZE:
-        data += b'\x00' * (SECTOR_SIZE - (len(data) % SECTOR_SIZE))
+    data += bytes(-len(data) % SECTOR_SIZE)
     return bytes(data)
 
 
+def copy_file_into(outf, src_path, nbytes):
+    """Append src_path's contents to outf at its current position.
+
+    Uses os.sendfile so the copy stays in the kernel and never buffers the
+    (potentially multi-GB) source in Python; falls back to copyfileobj where
+    sendfile is unavailable or refuses regular files (e.g. macOS)."""
+    with open(src_path, 'rb') as inf:
+        copied = 0
+        if hasattr(os, 'sendfile'):
+            outf.flush()
+            start = outf.tell()
+            out_fd = outf.fileno()
+            in_fd = inf.fileno()
+            try:
+                while copied < nbytes:
+                    sent = os.sendfile(out_fd, in_fd, copied, min(nbytes - copied, 1 << 30))
+                    if sent == 0:
+                        break
+                    copied += sent
+            except OSError:
+                pass
+            if copied:
+                # resync the buffered file object with the kernel offset
+                outf.seek(start + copied)
+            if copied >= nbytes:
+                return
+            inf.seek(copied)
+        # 4 MiB chunks instead of copyfileobj's 16 KB default: far fewer
+        # syscalls, and aligned with the typical SD card erase block
+        shutil.copyfileobj(inf, outf, length=4 * 1024 * 1024)
+
+
 def create_sdcard_image(bios_file, vga_bios_file, hdd_file, output_file, mem_mb=2):
     """
     Create SD card image by combining three input files at specific offsets.
@@ -250,6 +332,11 @@ def create_sdcard_image(bios_file, vga_bios_file, hdd_file, output_file, mem_mb=
         
         # Calculate total image size
         total_size = HDD_OFFSET + hdd_size
+
+        # Read the MBR once up front; build_config_stream derives the CHS
+        # geometry and IDENTIFY block from it without reopening the image
+        with open(hdd_file, 'rb') as inf:
+            mbr = inf.read(SECTOR_SIZE)
         
         print(f"Creating SD card image '{output_file}':")
         print(f"  BIOS: {bios_file} ({bios_size} bytes) at offset 0x{BIOS_OFFSET:08X}")
@@ -259,37 +346,54 @@ def create_sdcard_image(bios_file, vga_bios_file, hdd_file, output_file, mem_mb=
         print(f"  Total size: {total_size} bytes")
         
         # Create output image
-        with open(output_file, 'wb') as outf:
-            # Write BIOS at offset 0
-            with open(bios_file, 'rb') as inf:
-                outf.write(inf.read())
-            
-            # Pad to VGA BIOS offset
-            current_pos = outf.tell()
-            if current_pos < VGA_BIOS_OFFSET:
-                outf.write(b'\x00' * (VGA_BIOS_OFFSET - current_pos))
-            
-            # Write VGA BIOS at 64KB offset
-            with open(vga_bios_file, 'rb') as inf:
-                outf.write(inf.read())
-            
-            # Pad to CFG sector offset
-            current_pos = outf.tell()
-            if current_pos < CFG_OFFSET:
-                outf.write(b'\x00' * (CFG_OFFSET - current_pos))
-
-            # Write config stream starting at sector 192 (expect ~3 sectors)
-            cfg = build_config_stream(mem_kb, hdd_file)
-            outf.write(cfg)
-
-            # Pad to HDD offset (128KB)
-            current_pos = outf.tell()
-            if current_pos < HDD_OFFSET:
-                outf.write(b'\x00' * (HDD_OFFSET - current_pos))
-            
-            # Write HDD image at 128KB offset
-            with open(hdd_file, 'rb') as inf:
-                outf.write(inf.read())
+        with open(output_file, 'w+b') as outf:
+            if hdd_size <= SMALL_IMAGE_LIMIT:
+                # Small images: assemble everything in one zero-initialized
+                # buffer (the gaps come for free) and issue a single write()
+                # each input is read straight into its slice of the image,
+                # with no intermediate bytes object
+                buf = bytearray(total_size)
+                view = memoryview(buf)
+                with open(bios_file, 'rb') as inf:
+                    inf.readinto(view[BIOS_OFFSET:BIOS_OFFSET + bios_size])
+                with open(vga_bios_file, 'rb') as inf:
+                    inf.readinto(view[VGA_BIOS_OFFSET:VGA_BIOS_OFFSET + vga_bios_size])
+                cfg = build_config_stream(mem_kb, mbr, hdd_size)
+                buf[CFG_OFFSET:CFG_OFFSET + len(cfg)] = cfg
+                with open(hdd_file, 'rb') as inf:
+                    inf.readinto(view[HDD_OFFSET:])
+                view.release()
+                outf.write(buf)
+                print(f"Successfully created SD card image: {output_file}")
+                return True
+
+            # The header region (BIOS + VGA BIOS + cfg, everything below
+            # HDD_OFFSET) is laid out through a memory map: each input is
+            # read directly into its slice of the map, with no intermediate
+            # bytes objects. Unwritten gaps stay zero (sparse where the
+            # filesystem supports it).
+            outf.truncate(HDD_OFFSET)
+            with mmap.mmap(outf.fileno(), HDD_OFFSET) as out_mm:
+                mm_view = memoryview(out_mm)
+                # BIOS at offset 0
+                with open(bios_file, 'rb') as inf:
+                    inf.readinto(mm_view[BIOS_OFFSET:BIOS_OFFSET + bios_size])
+                # VGA BIOS at 64KB offset
+                with open(vga_bios_file, 'rb') as inf:
+                    inf.readinto(mm_view[VGA_BIOS_OFFSET:VGA_BIOS_OFFSET + vga_bios_size])
+                # Config stream starting at sector 192 (expect ~3 sectors)
+                cfg = build_config_stream(mem_kb, mbr, hdd_size)
+                out_mm[CFG_OFFSET:CFG_OFFSET + len(cfg)] = cfg
+                mm_view.release()
+                out_mm.flush()
+
+            # Write HDD image at 128KB offset; kernel-side copy, the image
+            # never passes through a Python bytes object
+            outf.seek(HDD_OFFSET)
+            copy_file_into(outf, hdd_file, hdd_size)
+
+            # Guarantee the final length even if nothing was written past a gap
+            outf.truncate(total_size)
         
         print(f"Successfully created SD card image: {output_file}")
         return True